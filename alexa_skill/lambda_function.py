@@ -3,56 +3,86 @@ from ask_sdk_core.dispatch_components import AbstractRequestHandler
 from ask_sdk_core.dispatch_components import AbstractExceptionHandler
 from ask_sdk_core.utils import is_request_type, is_intent_name
 from ask_sdk_model.interfaces.alexa.presentation.apl import RenderDocumentDirective
-import urllib.request
-import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Backend URL - edit this to your Cloudflare Tunnel URL
 BACKEND_URL = "https://your-tunnel-url.trycloudflare.com"
 
+# ウォーム起動間で再利用するHTTPセッション（TLSハンドシェイクを省略）
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=2,
+    pool_maxsize=4,
+    max_retries=Retry(total=1, backoff_factor=0.1),
+))
+
+
+def activate_lametric():
+    """LaMetricのバスアプリ表示をバックエンドに依頼（結果は使わない）"""
+    try:
+        SESSION.get(f"{BACKEND_URL}/lametric/activate", timeout=(2, 5))
+    except Exception:
+        pass
+
+
+# リクエスト判定用の述語（呼び出しごとに作らないよう起動時に生成）
+_IS_LAUNCH = is_request_type("LaunchRequest")
+_IS_GET_BUS = is_intent_name("GetBusTimeIntent")
+_IS_HELP = is_intent_name("AMAZON.HelpIntent")
+_IS_CANCEL = is_intent_name("AMAZON.CancelIntent")
+_IS_STOP = is_intent_name("AMAZON.StopIntent")
+_IS_FALLBACK = is_intent_name("AMAZON.FallbackIntent")
+_IS_SESSION_END = is_request_type("SessionEndedRequest")
+
+
+# APLドキュメントの固定部分（起動時に一度だけ生成）
+_APL_HEADER_ITEM = {
+    "type": "Text",
+    "text": "🚌 バス時刻表",
+    "fontSize": "40dp",
+    "fontWeight": "bold",
+    "color": "white",
+    "textAlign": "center",
+    "paddingBottom": "30dp"
+}
+
+_APL_LINE_STYLE = {
+    "type": "Text",
+    "fontSize": "24dp",
+    "textAlign": "left",
+    "width": "100%",
+    "paddingBottom": "10dp",
+    "fontFamily": "monospace"
+}
+
+_APL_CONTAINER_STYLE = {
+    "type": "Container",
+    "width": "100vw",
+    "height": "100vh",
+    "direction": "column",
+    "alignItems": "center",
+    "paddingTop": "40dp",
+    "paddingLeft": "40dp",
+    "paddingRight": "40dp"
+}
+
 
 def create_apl_document(lines_with_colors):
     """APLドキュメントを動的に生成（複数行・色分け対応）"""
-    text_items = [
-        {
-            "type": "Text",
-            "text": "🚌 バス時刻表",
-            "fontSize": "40dp",
-            "fontWeight": "bold",
-            "color": "white",
-            "textAlign": "center",
-            "paddingBottom": "30dp"
-        }
-    ]
-    
-    for line, color in lines_with_colors:
-        text_items.append({
-            "type": "Text",
-            "text": line,
-            "fontSize": "24dp",
-            "color": color,
-            "textAlign": "left",
-            "width": "100%",
-            "paddingBottom": "10dp",
-            "fontFamily": "monospace"
-        })
-    
+    text_items = [_APL_HEADER_ITEM]
+    text_items.extend(
+        {**_APL_LINE_STYLE, "text": line, "color": color}
+        for line, color in lines_with_colors
+    )
+
     return {
         "type": "APL",
         "version": "1.6",
         "mainTemplate": {
-            "items": [
-                {
-                    "type": "Container",
-                    "width": "100vw",
-                    "height": "100vh",
-                    "direction": "column",
-                    "alignItems": "center",
-                    "paddingTop": "40dp",
-                    "paddingLeft": "40dp",
-                    "paddingRight": "40dp",
-                    "items": text_items
-                }
-            ]
+            "items": [{**_APL_CONTAINER_STYLE, "items": text_items}]
         }
     }
 
@@ -102,7 +132,7 @@ def format_display_lines(items):
 
 class LaunchRequestHandler(AbstractRequestHandler):
     def can_handle(self, handler_input):
-        return is_request_type("LaunchRequest")(handler_input)
+        return _IS_LAUNCH(handler_input)
     
     def handle(self, handler_input):
         speech = "バス時刻スキルです。あとなんぷん、と聞いてください。"
@@ -111,26 +141,28 @@ class LaunchRequestHandler(AbstractRequestHandler):
 
 class GetBusTimeIntentHandler(AbstractRequestHandler):
     def can_handle(self, handler_input):
-        return is_intent_name("GetBusTimeIntent")(handler_input)
+        return _IS_GET_BUS(handler_input)
     
     def handle(self, handler_input):
         speech = "バス情報を取得できませんでした"
         display_items = []
         
+        # LaMetricの起動は音声取得と並行して投げる
+        activate_thread = threading.Thread(target=activate_lametric, daemon=True)
+        activate_thread.start()
+
         try:
-            url = f"{BACKEND_URL}/bus/speech"
-            req = urllib.request.Request(url)
-            with urllib.request.urlopen(req, timeout=10) as res:
-                data = json.loads(res.read().decode('utf-8'))
-                speech = data.get("speech", "バス情報を取得できませんでした")
-                display_items = data.get("display_items", [])
-
-            activate_url = f"{BACKEND_URL}/lametric/activate"
-            activate_req = urllib.request.Request(activate_url)
-            urllib.request.urlopen(activate_req, timeout=5)
+            res = SESSION.get(f"{BACKEND_URL}/bus/speech", timeout=(2, 10))
+            res.raise_for_status()
+            data = res.json()
+            speech = data.get("speech", "バス情報を取得できませんでした")
+            display_items = data.get("display_items", [])
         
         except Exception as e:
             speech = "エラーが発生しました"
+
+        # 応答後はLambdaが凍結されるため、返す前に完了を待つ
+        activate_thread.join(timeout=5)
         
         response_builder = handler_input.response_builder
         response_builder.speak(speech)
@@ -150,7 +182,7 @@ class GetBusTimeIntentHandler(AbstractRequestHandler):
 
 class HelpIntentHandler(AbstractRequestHandler):
     def can_handle(self, handler_input):
-        return is_intent_name("AMAZON.HelpIntent")(handler_input)
+        return _IS_HELP(handler_input)
     
     def handle(self, handler_input):
         speech = "あとなんぷん、と聞いてください。"
@@ -159,8 +191,7 @@ class HelpIntentHandler(AbstractRequestHandler):
 
 class CancelOrStopIntentHandler(AbstractRequestHandler):
     def can_handle(self, handler_input):
-        return (is_intent_name("AMAZON.CancelIntent")(handler_input) or
-                is_intent_name("AMAZON.StopIntent")(handler_input))
+        return _IS_CANCEL(handler_input) or _IS_STOP(handler_input)
     
     def handle(self, handler_input):
         return handler_input.response_builder.speak("さようなら").response
@@ -168,7 +199,7 @@ class CancelOrStopIntentHandler(AbstractRequestHandler):
 
 class FallbackIntentHandler(AbstractRequestHandler):
     def can_handle(self, handler_input):
-        return is_intent_name("AMAZON.FallbackIntent")(handler_input)
+        return _IS_FALLBACK(handler_input)
     
     def handle(self, handler_input):
         speech = "すみません、よく分かりませんでした。あとなんぷん、と聞いてください。"
@@ -177,7 +208,7 @@ class FallbackIntentHandler(AbstractRequestHandler):
 
 class SessionEndedRequestHandler(AbstractRequestHandler):
     def can_handle(self, handler_input):
-        return is_request_type("SessionEndedRequest")(handler_input)
+        return _IS_SESSION_END(handler_input)
     
     def handle(self, handler_input):
         return handler_input.response_builder.response
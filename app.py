@@ -1,34 +1,78 @@
 from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from datetime import datetime
+from functools import lru_cache
+import hashlib
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import threading
+import time
 from config import get_config
-from gtfs_parser import get_bus_data as get_gtfs_bus_data, get_next_buses_with_times, get_fallback_info
+from gtfs_parser import (
+    get_bus_data as get_gtfs_bus_data,
+    get_all_next_buses,
+    get_fallback_info,
+    start_background_load,
+)
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """jsonifyのシリアライズをorjsonで行うJSONプロバイダ"""
+
+    def dumps(self, obj, **kwargs):
+        option = 0
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # Load configuration
 config = get_config()
 
+# GTFSデータの読み込みを先に始めておく
+start_background_load()
+
+# LaMetric への接続を使い回すセッション（Basic認証もセッションに持たせる）
+_lametric_session = requests.Session()
+_lametric_session.auth = ("dev", config.lametric.api_key)
+_lametric_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+# LaMetricを時計に戻すタイマー（同時に1つだけ保持する）
+_revert_timer = None
+_revert_lock = threading.Lock()
+
+# /bus/speech の結果を使い回す秒数
+SPEECH_CACHE_SECONDS = 10
+
+
+# 0〜9分の読み方（インデックス = 分）
+_MINUTE_READINGS = (
+    "ぜろふん",
+    "いっぷん",
+    "にふん",
+    "さんぷん",
+    "よんぷん",
+    "ごふん",
+    "ろっぷん",
+    "ななふん",
+    "はっぷん",
+    "きゅうふん",
+)
+
 
 def minutes_to_speech(n):
     """数字を「〜ふん/ぷん」の正しい読みに変換"""
-    # 0〜9の読み方
-    readings = {
-        0: "ぜろふん",
-        1: "いっぷん",
-        2: "にふん",
-        3: "さんぷん",
-        4: "よんぷん",
-        5: "ごふん",
-        6: "ろっぷん",
-        7: "ななふん",
-        8: "はっぷん",
-        9: "きゅうふん",
-    }
-
-    if n in readings:
-        return readings[n]
+    if 0 <= n < len(_MINUTE_READINGS):
+        return _MINUTE_READINGS[n]
 
     # 10以上はそのまま数字+分
     return f"{n}分"
@@ -38,11 +82,30 @@ def activate_lametric_app(package, widget):
     """LaMetricの指定アプリをアクティブにする"""
     url = f"http://{config.lametric.ip}:8080/api/v2/device/apps/{package}/widgets/{widget}/activate"
     try:
-        requests.put(url, auth=("dev", config.lametric.api_key), timeout=5)
+        _lametric_session.put(url, timeout=5)
     except Exception as e:
         print(f"LaMetric activate error: {e}")
 
 
+def revert_to_clock():
+    """LaMetricを時計アプリに戻す"""
+    activate_lametric_app(
+        config.lametric.clock_app.package,
+        config.lametric.clock_app.widget
+    )
+
+
+def schedule_revert_to_clock(delay):
+    """delay秒後に時計に戻す（既に予約があれば取り消して予約し直す）"""
+    global _revert_timer
+    with _revert_lock:
+        if _revert_timer is not None:
+            _revert_timer.cancel()
+        _revert_timer = threading.Timer(delay, revert_to_clock)
+        _revert_timer.daemon = True
+        _revert_timer.start()
+
+
 def get_bus_data():
     """
     GTFSデータからバス到着情報を取得
@@ -53,9 +116,7 @@ def get_bus_data():
 
     # Config から動的にキーを生成
     for route in config.routes:
-        key = f"{route.stop}_{route.destination}"
-        gtfs_key = f"{route.stop}_{route.destination}"
-        result[key] = gtfs_data.get(gtfs_key, [])
+        result[route.result_key] = gtfs_data.get(route.result_key, [])
 
     return result
 
@@ -75,13 +136,41 @@ def get_bus():
 @app.route("/bus/speech")
 def get_bus_speech():
     """Alexa用の音声テキストと画面表示用テキストを返す"""
+    # 連続した問い合わせ（言い直しなど）では10秒間だけ計算・シリアライズ結果を使い回す
+    # 内容は最初の問い合わせ時点のものなので、古さは最大でもこの10秒に収まる
+    body, etag = bus_speech_body(int(time.time() // SPEECH_CACHE_SECONDS))
+
+    # 内容が変わっていなければ 304 Not Modified を返す
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@lru_cache(maxsize=4)
+def bus_speech_body(bucket):
+    """
+    /bus/speech のレスポンス本文とETagを生成
+
+    bucket はキャッシュ用のキー（SPEECH_CACHE_SECONDS 秒ごとの通し番号）で、計算自体は現在時刻で行う
+    """
+    body = app.json.dumps(build_bus_speech())
+    etag = hashlib.blake2b(body.encode("utf-8"), digest_size=8).hexdigest()
+    return body, etag
+
+
+def build_bus_speech():
+    """音声テキストと画面表示データを生成"""
     speech_parts = []  # 音声用（ひらがな）
     display_items = []  # 画面表示用（構造化データ）
 
-    # まずデータを収集
+    now = datetime.now()
+
+    # まずデータを収集（全ルートを一度に取得）
+    all_buses = get_all_next_buses(config.routes, now)
     route_data = []
     for route in config.routes:
-        buses = get_next_buses_with_times(route.stop, route.destination)
+        buses = all_buses[route.result_key]
         if buses:
             route_data.append({
                 "speech_name": route.speech_name,
@@ -109,14 +198,14 @@ def get_bus_speech():
         speech = "。".join(speech_parts) + "です"
 
         # フォールバック使用時は注釈を追加
-        fallback_info = get_fallback_info()
+        fallback_info = get_fallback_info(now)
         if fallback_info["is_fallback"] and fallback_info["fallback_date_formatted"]:
             speech += f"。なお、この時刻表は{fallback_info['fallback_date_formatted']}現在の情報を元にしています"
 
-    return jsonify({
+    return {
         "speech": speech,
         "display_items": display_items
-    })
+    }
 
 
 @app.route("/lametric")
@@ -127,7 +216,7 @@ def get_lametric():
     result = {}
 
     for route in config.routes:
-        data_key = f"{route.stop}_{route.destination}"
+        data_key = route.result_key
         # lametric_keyが指定されていればそれを使用、なければdata_keyと同じ
         output_key = route.lametric_key if route.lametric_key else data_key
         if data_key in data and data[data_key]:
@@ -147,15 +236,8 @@ def activate_bus_app():
         config.lametric.bus_app.widget
     )
 
-    # 5分後に時計に戻すタイマーを設定
-    def revert_to_clock():
-        activate_lametric_app(
-            config.lametric.clock_app.package,
-            config.lametric.clock_app.widget
-        )
-
-    timer = threading.Timer(300, revert_to_clock)  # 300秒 = 5分
-    timer.start()
+    # 5分後に時計に戻すタイマーを設定（連続で呼ばれても待機スレッドは1つ）
+    schedule_revert_to_clock(300)  # 300秒 = 5分
 
     return jsonify({
         "status": "ok",
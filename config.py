@@ -8,6 +8,12 @@ from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 from pathlib import Path
 
+# libyaml があれば C 実装のローダーを使う
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 
 @dataclass
 class LaMetricAppConfig:
@@ -42,6 +48,10 @@ class RouteConfig:
     speech_name: str
     display_name: str
     lametric_key: Optional[str] = None  # LaMetric用のキー名（省略時はstop_destinationを使用）
+    result_key: str = field(init=False)  # バス情報データのキー（stop_destination）
+
+    def __post_init__(self):
+        self.result_key = f"{self.stop}_{self.destination}"
 
 
 @dataclass
@@ -68,6 +78,15 @@ class Config:
     routes: List[RouteConfig]
     server: ServerConfig = field(default_factory=ServerConfig)
     logging: LoggingConfig = field(default_factory=LoggingConfig)
+    all_stop_ids: frozenset = field(init=False)  # 全バス停のstop_id
+    stop_ids_by_stop: Dict[str, frozenset] = field(init=False)  # バス停キーごとのstop_id
+
+    def __post_init__(self):
+        self.stop_ids_by_stop = {
+            key: frozenset(stop_config.stop_ids)
+            for key, stop_config in self.bus_stops.items()
+        }
+        self.all_stop_ids = frozenset().union(*self.stop_ids_by_stop.values())
 
     @classmethod
     def from_dict(cls, data: dict) -> "Config":
@@ -194,7 +213,7 @@ def load_config(config_path: Optional[str] = None) -> Config:
         )
 
     with open(path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f)
+        data = yaml.load(f, Loader=_YamlLoader)
 
     config = Config.from_dict(data)
     print(f"Configuration loaded from: {path}")
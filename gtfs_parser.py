@@ -2,200 +2,527 @@
 GTFS データパーサー
 小田急バスの時刻表データから次のバス発車時刻を取得する
 """
+import bisect
 import csv
+import hashlib
+import heapq
+import json
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import pickle
+import threading
+from array import array
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
-from config import get_config
+from config import RouteConfig, get_config
 
 # データディレクトリ
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
+# 解析済みデータの保存先（CSVの再解析を省略するため。update_gtfs.py がデータ更新時に削除する）
+CACHE_FILENAME = "gtfs_cache.pkl"
+
+# 保存形式のバージョン（_cacheの構造を変えたら上げる）
+_CACHE_FORMAT = 5
+
 # キャッシュ（起動時に一度だけ読み込む）
 _cache = {
     "calendar_dates": None,
-    "trip_services": None,
-    "stop_times": None,
+    "dates_by_weekday": None,
+    "stop_times_by_stop": None,
+    "dest_bits": None,
     "loaded": False,
 }
 
-# フォールバック状態を追跡
-_fallback_info = {
-    "is_fallback": False,
-    "original_date": None,
-    "fallback_date": None,
-}
+# 読み込みが二重に走らないようにするロック
+_load_lock = threading.Lock()
 
+# start_background_load() で開始した読み込みスレッド
+_load_thread = None
 
-def _get_all_stop_ids() -> set:
-    """設定から全バス停IDを取得"""
-    config = get_config()
-    all_stop_ids = set()
-    for stop_config in config.bus_stops.values():
-        all_stop_ids.update(stop_config.stop_ids)
-    return all_stop_ids
+# 運行service_idがない日に返す空集合
+_EMPTY_SERVICES = frozenset()
 
 
-def _find_fallback_date(target_date: str, calendar_dates: dict) -> Optional[str]:
+@lru_cache(maxsize=8)
+def _find_fallback_date(target_date: str) -> Optional[str]:
     """
     指定日付がcalendar_datesにない場合、同じ曜日の最新日付を探す
 
+    結果は日付ごとにキャッシュするので、探索とログ出力は1日1回だけ行われる
+
     Args:
         target_date: YYYYMMDD形式の日付
-        calendar_dates: {date: [service_ids]} の辞書
 
     Returns:
-        フォールバック用の日付（YYYYMMDD形式）、見つからなければNone
+        運行情報を使う日付（YYYYMMDD形式）、見つからなければNone
     """
-    global _fallback_info
-
-    if target_date in calendar_dates:
-        _fallback_info["is_fallback"] = False
-        _fallback_info["original_date"] = target_date
-        _fallback_info["fallback_date"] = None
+    if target_date in _cache["calendar_dates"]:
         return target_date
 
     # 対象日の曜日を取得
     try:
-        target_dt = datetime.strptime(target_date, "%Y%m%d")
-        target_weekday = target_dt.weekday()
+        target_weekday = datetime.strptime(target_date, "%Y%m%d").weekday()
     except ValueError:
         return None
 
-    # calendar_datesにある日付から同じ曜日のものを探す
-    same_weekday_dates = []
-    for date_str in calendar_dates.keys():
-        try:
-            dt = datetime.strptime(date_str, "%Y%m%d")
-            if dt.weekday() == target_weekday:
-                same_weekday_dates.append(date_str)
-        except ValueError:
-            continue
-
+    # 同じ曜日の最新日付（曜日ごとの日付リストは読み込み時に降順で作成済み）
+    same_weekday_dates = _cache["dates_by_weekday"][target_weekday]
     if not same_weekday_dates:
         return None
 
-    # 最新の日付を返す
-    same_weekday_dates.sort(reverse=True)
     fallback_date = same_weekday_dates[0]
     print(f"[GTFS] Date {target_date} not in calendar, using fallback: {fallback_date} (same weekday)")
 
-    # フォールバック情報を更新
-    _fallback_info["is_fallback"] = True
-    _fallback_info["original_date"] = target_date
-    _fallback_info["fallback_date"] = fallback_date
-
     return fallback_date
 
 
-def get_fallback_info() -> Dict:
+def get_fallback_info(now: Optional[datetime] = None) -> Dict:
     """
-    フォールバック状態を取得
+    指定日（省略時は今日）のフォールバック状態を取得
 
     Returns:
         {
             "is_fallback": bool,
-            "original_date": str or None,  # YYYYMMDD
+            "original_date": str,  # YYYYMMDD
             "fallback_date": str or None,  # YYYYMMDD
             "fallback_date_formatted": str or None,  # "1月27日" 形式
         }
     """
-    info = _fallback_info.copy()
+    _load_all_data()
+
+    if now is None:
+        now = datetime.now()
+
+    original_date = now.strftime("%Y%m%d")
+    effective_date = _find_fallback_date(original_date)
+    is_fallback = effective_date is not None and effective_date != original_date
 
-    if info["is_fallback"] and info["fallback_date"]:
+    info = {
+        "is_fallback": is_fallback,
+        "original_date": original_date,
+        "fallback_date": effective_date if is_fallback else None,
+        "fallback_date_formatted": None,
+    }
+
+    if is_fallback:
         try:
-            dt = datetime.strptime(info["fallback_date"], "%Y%m%d")
+            dt = datetime.strptime(effective_date, "%Y%m%d")
             info["fallback_date_formatted"] = f"{dt.month}月{dt.day}日"
         except ValueError:
             info["fallback_date_formatted"] = None
-    else:
-        info["fallback_date_formatted"] = None
 
     return info
 
 
+def _get_data_version() -> Optional[str]:
+    """update_gtfs.py が記録したデータバージョン（日付）を取得"""
+    try:
+        with open(os.path.join(DATA_DIR, "version.json"), "r") as f:
+            return json.load(f).get("date")
+    except (OSError, ValueError):
+        return None
+
+
+def _data_cache_key(paths: List[str], all_stop_ids: frozenset, destinations: Dict[str, List[str]]) -> str:
+    """
+    解析済みデータのキャッシュキーを作る
+
+    データバージョン・CSVの更新日時・サイズに加え、読み込み結果に影響する設定（対象バス停・行き先）も含める
+    """
+    h = hashlib.sha256(f"format={_CACHE_FORMAT}\nversion={_get_data_version()}\n".encode())
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{os.path.basename(path)}:{st.st_mtime_ns}:{st.st_size}\n".encode())
+    h.update(repr(sorted(all_stop_ids)).encode())
+    h.update(repr(sorted(destinations.items())).encode())
+    return h.hexdigest()
+
+
+def _load_cached_data(cache_path: str, cache_key: str) -> bool:
+    """保存済みの解析結果を読み込む。キーが一致しなければFalse"""
+    try:
+        with open(cache_path, "rb") as f:
+            saved = pickle.load(f)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        print(f"[GTFS] Ignoring unreadable cache {cache_path}: {e}")
+        return False
+
+    if saved.get("key") != cache_key:
+        return False
+
+    _cache.update(saved["data"])
+    return True
+
+
+def _save_cached_data(cache_path: str, cache_key: str):
+    """解析結果を保存する（失敗しても動作には影響しない）"""
+    data = {name: value for name, value in _cache.items() if name != "loaded"}
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"key": cache_key, "data": data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"[GTFS] Could not write cache {cache_path}: {e}")
+    finally:
+        # 書き込みが途中で失敗した場合の一時ファイルを残さない
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def _load_all_data():
-    """全データを一度に読み込んでキャッシュ"""
+    """
+    全データを一度に読み込んでキャッシュ
+
+    起動時にバックグラウンドで読み込みを始めるので、読み込み中に呼ばれた場合は完了を待つ
+    """
     if _cache["loaded"]:
         return
 
+    with _load_lock:
+        if not _cache["loaded"]:
+            _read_all_data()
+
+
+def _read_all_data():
+    """CSV（または保存済みの解析結果）を読み込んで_cacheに格納する（_load_lock内で呼ぶ）"""
+    config = get_config()
+    all_stop_ids = config.all_stop_ids
+
+    calendar_path = os.path.join(DATA_DIR, "calendar_dates.txt")
+    trips_path = os.path.join(DATA_DIR, "trips.txt")
+    stop_times_path = os.path.join(DATA_DIR, "stop_times.txt")
+
+    # 前回の解析結果が使えればCSVは読まない
+    cache_path = os.path.join(DATA_DIR, CACHE_FILENAME)
+    cache_key = _data_cache_key(
+        [calendar_path, trips_path, stop_times_path], all_stop_ids, config.destinations
+    )
+    if _load_cached_data(cache_path, cache_key):
+        _cache["loaded"] = True
+        print(f"GTFS data loaded from cache: {cache_path}")
+        return
+
     print("Loading GTFS data...")
 
+    # service_idは文字列のまま比較せず、読み込み順の連番（service番号）に置き換える
+    service_numbers = {}
+
     # calendar_dates.txt
-    calendar_path = os.path.join(DATA_DIR, "calendar_dates.txt")
     service_dates = {}
-    with open(calendar_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    with open(calendar_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        service_col = header.index("service_id")
+        date_col = header.index("date")
+        exception_col = header.index("exception_type") if "exception_type" in header else None
         for row in reader:
-            service_id = row["service_id"]
-            date = row["date"]
-            exception_type = row.get("exception_type", "1")
+            if not row:
+                continue
+            service_id = service_numbers.setdefault(row[service_col], len(service_numbers))
+            date = row[date_col]
+            exception_type = row[exception_col] if exception_col is not None else "1"
             if exception_type == "1":
                 if date not in service_dates:
                     service_dates[date] = []
                 service_dates[date].append(service_id)
-    _cache["calendar_dates"] = service_dates
+    # 読み込み後は変更しないので、問い合わせ時にsetを作り直さずに済むようfrozensetにしておく
+    _cache["calendar_dates"] = {
+        date: frozenset(service_ids) for date, service_ids in service_dates.items()
+    }
+
+    # フォールバック用に、曜日ごとの日付リストを新しい順に作っておく
+    dates_by_weekday = [[] for _ in range(7)]
+    for date in service_dates:
+        try:
+            dates_by_weekday[datetime.strptime(date, "%Y%m%d").weekday()].append(date)
+        except ValueError:
+            continue
+    for dates in dates_by_weekday:
+        dates.sort(reverse=True)
+    _cache["dates_by_weekday"] = dates_by_weekday
 
     # trips.txt
-    trips_path = os.path.join(DATA_DIR, "trips.txt")
     trip_services = {}
-    with open(trips_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    with open(trips_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        trip_col = header.index("trip_id")
+        service_col = header.index("service_id")
         for row in reader:
-            trip_services[row["trip_id"]] = row["service_id"]
-    _cache["trip_services"] = trip_services
+            if not row:
+                continue
+            # calendar_datesに出てこないserviceの便は運行しないので読まない
+            service_id = service_numbers.get(row[service_col])
+            if service_id is not None:
+                trip_services[row[trip_col]] = service_id
 
     # stop_times.txt（必要なバス停のみ）
-    all_stop_ids = _get_all_stop_ids()
-
-    stop_times_path = os.path.join(DATA_DIR, "stop_times.txt")
-    stop_times = []
-    with open(stop_times_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    stop_times_by_stop = {}
+    time_str_by_minute = {}  # 同じ時刻の表示文字列は1つのオブジェクトを共有する
+    headsigns = {}  # 方向幕も同様に、同じ文字列は1つのオブジェクトを共有する
+    count = 0
+    with open(stop_times_path, "r", encoding="utf-8", newline="") as f:
+        # 行数が多いのでDictReaderは使わず、列位置で必要な列だけ取り出す
+        reader = csv.reader(f)
+        header = next(reader)
+        trip_col = header.index("trip_id")
+        dep_col = header.index("departure_time")
+        stop_col = header.index("stop_id")
+        headsign_col = header.index("stop_headsign") if "stop_headsign" in header else None
         for row in reader:
-            if row["stop_id"] in all_stop_ids:
-                stop_times.append({
-                    "trip_id": row["trip_id"],
-                    "departure_time": row["departure_time"],
-                    "stop_id": row["stop_id"],
-                    "headsign": row.get("stop_headsign", ""),
-                })
-    _cache["stop_times"] = stop_times
+            if not row:
+                continue
+            stop_id = row[stop_col]
+            if stop_id not in all_stop_ids:
+                continue
+            # service_idは読み込み時に引いておく（trips.txtにない便は運行しないので捨てる）
+            service_id = trip_services.get(row[trip_col])
+            if service_id is None:
+                continue
+            # 発車時刻は読み込み時に一度だけ解析しておく
+            dep_sec = parse_seconds(row[dep_col])
+            if dep_sec is None:
+                continue
+            # 時刻を HH:MM 形式に変換（24時超え対応）
+            dep_min = dep_sec // 60
+            time_str = time_str_by_minute.get(dep_min)
+            if time_str is None:
+                time_str = time_str_by_minute[dep_min] = f"{(dep_min // 60) % 24:02d}:{dep_min % 60:02d}"
+            # バス停IDごとに振り分けておき、問い合わせ時は該当バス停の行だけ見る
+            # 行ごとのdictは作らず、列ごとのリストに詰める
+            columns = stop_times_by_stop.get(stop_id)
+            if columns is None:
+                columns = stop_times_by_stop[stop_id] = {
+                    "service_id": [],
+                    "dep_sec": [],
+                    "time_str": [],
+                    "headsign": [],
+                }
+            columns["service_id"].append(service_id)
+            columns["dep_sec"].append(dep_sec)
+            columns["time_str"].append(time_str)
+            headsign = row[headsign_col] if headsign_col is not None else ""
+            columns["headsign"].append(headsigns.setdefault(headsign, headsign))
+            count += 1
+
+    # 発車時刻順に並べておき、問い合わせ時は二分探索で現在時刻から読み始める
+    _sort_stop_columns(stop_times_by_stop)
+
+    # 行き先（方向幕）の判定は設定が変わらない限り固定なので、読み込み時に済ませる
+    # 行き先キーごとにビットを割り当て、1行の一致結果を1つの整数にまとめる
+    dest_bits = {dest_key: 1 << i for i, dest_key in enumerate(config.destinations)}
+    _build_destination_masks(stop_times_by_stop, dest_bits, config.destinations)
+    _cache["stop_times_by_stop"] = stop_times_by_stop
+    _cache["dest_bits"] = dest_bits
 
     _cache["loaded"] = True
-    print(f"GTFS data loaded: {len(stop_times)} stop times for target stops")
+    print(f"GTFS data loaded: {count} stop times for target stops")
+
+    _save_cached_data(cache_path, cache_key)
+
+
+def _sort_stop_columns(stop_times_by_stop: dict):
+    """
+    バス停ごとの各列を発車時刻順に並べ替える
+
+    発車時刻・service番号はint配列（array）に詰め、行ごとのintオブジェクトを持たないようにする
+    """
+    for columns in stop_times_by_stop.values():
+        dep_secs = columns["dep_sec"]
+        order = sorted(range(len(dep_secs)), key=dep_secs.__getitem__)
+        for name, values in columns.items():
+            columns[name] = [values[i] for i in order]
+        columns["dep_sec"] = array("i", columns["dep_sec"])
+        columns["service_id"] = array("I", columns["service_id"])
+
 
+def _build_destination_masks(stop_times_by_stop: dict, dest_bits: Dict[str, int], destinations: Dict[str, List[str]]):
+    """
+    バス停ごとに、各行が一致する行き先をビットで表したマスク列を作る
 
-def parse_time(time_str: str) -> Optional[timedelta]:
-    """時刻文字列をtimedeltaに変換（24時超え対応）"""
+    headsign列はマスク作成後は不要なので削除する
+    """
+    # 方向幕の種類は行数よりずっと少ないので、パターン照合は方向幕ごとに一度だけ行う
+    mask_by_headsign = {}
+    for columns in stop_times_by_stop.values():
+        masks = []
+        for headsign in columns.pop("headsign"):
+            mask = mask_by_headsign.get(headsign)
+            if mask is None:
+                mask = 0
+                for dest_key, patterns in destinations.items():
+                    # パターン未設定の行き先（YAMLで値が空）はどの方向幕にも一致しない
+                    if not patterns:
+                        continue
+                    if any(pattern in headsign for pattern in patterns):
+                        mask |= dest_bits[dest_key]
+                mask_by_headsign[headsign] = mask
+            masks.append(mask)
+        # 64種類までなら符号なし64bit配列に詰める
+        columns["dest_mask"] = array("Q", masks) if len(dest_bits) <= 64 else masks
+
+
+def parse_seconds(time_str: str) -> Optional[int]:
+    """時刻文字列を運行日0時からの秒数に変換（24時超え対応）"""
     try:
         parts = time_str.split(":")
         hours = int(parts[0])
         minutes = int(parts[1])
         seconds = int(parts[2]) if len(parts) > 2 else 0
-        return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+        return hours * 3600 + minutes * 60 + seconds
     except:
         return None
 
 
-def get_next_buses(
+def _get_today_services(today: str) -> Optional[frozenset]:
+    """指定日（YYYYMMDD）に運行するservice_idの集合を取得（フォールバック対応）"""
+    effective_date = _find_fallback_date(today)
+    if effective_date is None:
+        return None
+    return _cache["calendar_dates"].get(effective_date, _EMPTY_SERVICES)
+
+
+def _scan_departures(
+    stop_ids: frozenset,
+    destinations: Tuple[str, ...],
+    today_services: frozenset,
+    start_sec: int,
+    count_from_sec: int,
+    limit: int
+) -> Dict[str, List[Tuple[int, str]]]:
+    """
+    指定バス停ID群から各行き先への start_sec 以降の発車を探す
+
+    同じバス停の行き先はまとめて扱い、各バス停IDの行は一度だけ走査する。
+    count_from_sec 以降の発車がlimit本見つかった行き先はそのバス停IDでの探索を打ち切る
+
+    Returns:
+        {行き先キー: 発車時刻順の (発車秒, "HH:MM") のリスト（count_from_sec 以降はlimit本まで）}
+    """
+    stop_times_by_stop = _cache["stop_times_by_stop"]
+    dest_bits = _cache["dest_bits"]
+
+    # いずれかの行き先に一致するかを1回のビット演算で見るためのマスク
+    all_wanted = 0
+    for destination in destinations:
+        all_wanted |= dest_bits[destination]
+
+    candidates = {destination: [] for destination in destinations}
+    for stop_id in stop_ids:
+        columns = stop_times_by_stop.get(stop_id)
+        if columns is None:
+            continue
+
+        # まだlimit本見つかっていない行き先の [ビット, このバス停IDでの候補リスト, 残り本数]
+        pending = []
+        for destination, runs in candidates.items():
+            run = []
+            runs.append(run)
+            pending.append([dest_bits[destination], run, limit])
+        wanted = all_wanted
+
+        # 発車時刻順に並んでいるので、start_sec以降の最初の行から読む
+        dep_secs = columns["dep_sec"]
+        service_ids = columns["service_id"]
+        time_strs = columns["time_str"]
+        dest_masks = columns["dest_mask"]
+        for i in range(bisect.bisect_left(dep_secs, start_sec), len(dep_secs)):
+            # 行き先チェック（読み込み時に作成したマスクとのAND）
+            mask = dest_masks[i] & wanted
+            if not mask:
+                continue
+
+            # service番号チェック（今日運行するか）
+            if service_ids[i] not in today_services:
+                continue
+
+            counted = dep_secs[i] >= count_from_sec
+            filled = False
+            for entry in pending:
+                if mask & entry[0]:
+                    entry[1].append((dep_secs[i], time_strs[i]))
+                    if counted:
+                        entry[2] -= 1
+                        filled = filled or entry[2] <= 0
+
+            # このバス停IDからは各行き先limit本あれば十分
+            if filled:
+                pending = [entry for entry in pending if entry[2] > 0]
+                if not pending:
+                    break
+                wanted = 0
+                for entry in pending:
+                    wanted |= entry[0]
+
+    # バス停IDごとの候補は発車時刻順なので、全体を並べ替えずに必要な本数だけ併合する
+    result = {}
+    for destination, runs in candidates.items():
+        departures = []
+        remaining = limit
+        for departure in heapq.merge(*runs):
+            if departure[0] >= count_from_sec:
+                if remaining <= 0:
+                    break
+                remaining -= 1
+            departures.append(departure)
+        result[destination] = departures
+    return result
+
+
+@lru_cache(maxsize=64)
+def _minute_departures(
     stop_location: str,
-    destination: str,
-    now: Optional[datetime] = None,
-    limit: int = 3
-) -> List[int]:
+    destinations: Tuple[str, ...],
+    today: str,
+    minute_sec: int,
+    limit: int
+) -> Dict[str, Tuple[Tuple[int, str], ...]]:
     """
-    指定バス停から指定行き先への次のバスを取得
+    ある1分間の問い合わせに共通の発車候補を取得（同じ分の問い合わせはキャッシュから返す）
+
+    分内のどの時刻から見てもlimit本揃うよう、その分の間に発車する便は本数に数えずに含めておく
 
     Args:
-        stop_location: bus_stops config key (e.g., "stop_a")
-        destination: destinations config key (e.g., "destination_1")
-        now: 現在時刻（省略時は現在時刻）
-        limit: 取得する本数
+        minute_sec: その分の開始時刻（0時からの秒数）
+    """
+    today_services = _get_today_services(today)
+    if today_services is None:
+        return {destination: () for destination in destinations}
+
+    stop_ids = get_config().stop_ids_by_stop[stop_location]
+    found = _scan_departures(
+        stop_ids, destinations, today_services, minute_sec, minute_sec + 60, limit
+    )
+    return {destination: tuple(departures) for destination, departures in found.items()}
+
+
+def _upcoming(departures, current_sec: int, limit: int) -> List[Tuple[int, str]]:
+    """発車候補から現在時刻以降のlimit本を (あと何分, "HH:MM") で返す"""
+    result = []
+    for dep_sec, time_str in departures:
+        if len(result) >= limit:
+            break
+        if dep_sec < current_sec:
+            continue
+        result.append(((dep_sec - current_sec) // 60, time_str))
+    return result
 
-    Returns:
-        あと何分のリスト（例: [3, 8, 15]）
+
+def _collect_candidates(
+    stop_location: str,
+    destination: str,
+    now: Optional[datetime],
+    limit: int
+) -> List[Tuple[int, str]]:
+    """
+    指定バス停から指定行き先への次のバスを (あと何分, "HH:MM") のリストで取得
+
+    get_next_buses / get_next_buses_with_times の共通部分
     """
     # データ読み込み（初回のみ）
     _load_all_data()
@@ -205,69 +532,43 @@ def get_next_buses(
     if now is None:
         now = datetime.now()
 
-    # 今日の日付（YYYYMMDD形式）
-    today = now.strftime("%Y%m%d")
-
-    # 現在時刻をtimedelta に変換
-    current_time = timedelta(hours=now.hour, minutes=now.minute, seconds=now.second)
+    # 現在時刻を0時からの秒数に変換
+    current_sec = now.hour * 3600 + now.minute * 60 + now.second
 
     # バス停情報
-    stop_config = config.bus_stops.get(stop_location)
-    if not stop_config:
+    if not config.stop_ids_by_stop.get(stop_location):
         return []
 
     # 行き先パターン
-    dest_patterns = config.destinations.get(destination, [])
-    if not dest_patterns:
+    if not config.destinations.get(destination):
         return []
 
-    # キャッシュからデータ取得
-    calendar_dates = _cache["calendar_dates"]
-    trip_services = _cache["trip_services"]
-    stop_times = _cache["stop_times"]
-
-    # 今日運行するservice_id（フォールバック対応）
-    effective_date = _find_fallback_date(today, calendar_dates)
-    if effective_date is None:
-        return []
-    today_services = set(calendar_dates.get(effective_date, []))
-
-    # 該当するバスを抽出
-    candidates = []
-    target_stop_ids = set(stop_config.stop_ids)
-
-    for st in stop_times:
-        # バス停チェック
-        if st["stop_id"] not in target_stop_ids:
-            continue
-
-        # 行き先チェック
-        headsign = st["headsign"]
-        if not any(pattern in headsign for pattern in dest_patterns):
-            continue
+    departures = _minute_departures(
+        stop_location, (destination,), now.strftime("%Y%m%d"), current_sec - now.second, limit
+    )[destination]
+    return _upcoming(departures, current_sec, limit)
 
-        # service_idチェック（今日運行するか）
-        service_id = trip_services.get(st["trip_id"])
-        if service_id not in today_services:
-            continue
-
-        # 発車時刻
-        dep_time = parse_time(st["departure_time"])
-        if dep_time is None:
-            continue
 
-        # 現在時刻以降のみ
-        if dep_time < current_time:
-            continue
+def get_next_buses(
+    stop_location: str,
+    destination: str,
+    now: Optional[datetime] = None,
+    limit: int = 3
+) -> List[int]:
+    """
+    指定バス停から指定行き先への次のバスを取得
 
-        # あと何分
-        diff = dep_time - current_time
-        minutes = int(diff.total_seconds() / 60)
-        candidates.append(minutes)
+    Args:
+        stop_location: bus_stops config key (e.g., "stop_a")
+        destination: destinations config key (e.g., "destination_1")
+        now: 現在時刻（省略時は現在時刻）
+        limit: 取得する本数
 
-    # ソートして上位を返す
-    candidates.sort()
-    return candidates[:limit]
+    Returns:
+        あと何分のリスト（例: [3, 8, 15]）
+    """
+    result = _collect_candidates(stop_location, destination, now, limit)
+    return [minutes for minutes, _ in result]
 
 
 def get_next_buses_with_times(
@@ -282,6 +583,26 @@ def get_next_buses_with_times(
     Returns:
         [{"minutes": 3, "time": "07:15"}, {"minutes": 8, "time": "07:20"}, ...]
     """
+    result = _collect_candidates(stop_location, destination, now, limit)
+    return [{"minutes": minutes, "time": time_str} for minutes, time_str in result]
+
+
+def get_all_next_buses(
+    routes: List[RouteConfig],
+    now: Optional[datetime] = None,
+    limit: int = 3
+) -> Dict[str, List[Dict]]:
+    """
+    複数ルートの次のバスをまとめて取得（絶対時刻付き）
+
+    日付・運行service_idの判定はルート数によらず一度だけ行う
+
+    Returns:
+        {
+            "stop_a_destination_1": [{"minutes": 3, "time": "07:15"}, ...],
+            ...
+        }
+    """
     _load_all_data()
 
     config = get_config()
@@ -290,60 +611,30 @@ def get_next_buses_with_times(
         now = datetime.now()
 
     today = now.strftime("%Y%m%d")
-    current_time = timedelta(hours=now.hour, minutes=now.minute, seconds=now.second)
-
-    stop_config = config.bus_stops.get(stop_location)
-    if not stop_config:
-        return []
+    current_sec = now.hour * 3600 + now.minute * 60 + now.second
+    minute_sec = current_sec - now.second
 
-    dest_patterns = config.destinations.get(destination, [])
-    if not dest_patterns:
-        return []
+    # バス停ごとに行き先をまとめ、各バス停の行は一度だけ走査する
+    destinations_by_stop = {}
+    for route in routes:
+        if config.stop_ids_by_stop.get(route.stop) and config.destinations.get(route.destination):
+            destinations_by_stop.setdefault(route.stop, {})[route.destination] = None
 
-    calendar_dates = _cache["calendar_dates"]
-    trip_services = _cache["trip_services"]
-    stop_times = _cache["stop_times"]
+    departures_by_route = {}
+    for stop, destinations in destinations_by_stop.items():
+        found = _minute_departures(stop, tuple(destinations), today, minute_sec, limit)
+        for destination, departures in found.items():
+            departures_by_route[(stop, destination)] = departures
 
-    # フォールバック対応
-    effective_date = _find_fallback_date(today, calendar_dates)
-    if effective_date is None:
-        return []
-    today_services = set(calendar_dates.get(effective_date, []))
-    candidates = []
-    target_stop_ids = set(stop_config.stop_ids)
+    result = {}
+    for route in routes:
+        departures = departures_by_route.get((route.stop, route.destination), ())
+        result[route.result_key] = [
+            {"minutes": minutes, "time": time_str}
+            for minutes, time_str in _upcoming(departures, current_sec, limit)
+        ]
 
-    for st in stop_times:
-        if st["stop_id"] not in target_stop_ids:
-            continue
-
-        headsign = st["headsign"]
-        if not any(pattern in headsign for pattern in dest_patterns):
-            continue
-
-        service_id = trip_services.get(st["trip_id"])
-        if service_id not in today_services:
-            continue
-
-        dep_time = parse_time(st["departure_time"])
-        if dep_time is None:
-            continue
-
-        if dep_time < current_time:
-            continue
-
-        diff = dep_time - current_time
-        minutes = int(diff.total_seconds() / 60)
-
-        # 時刻を HH:MM 形式に変換（24時超え対応）
-        total_minutes = int(dep_time.total_seconds() / 60)
-        hours = (total_minutes // 60) % 24
-        mins = total_minutes % 60
-        time_str = f"{hours:02d}:{mins:02d}"
-
-        candidates.append({"minutes": minutes, "time": time_str})
-
-    candidates.sort(key=lambda x: x["minutes"])
-    return candidates[:limit]
+    return result
 
 
 def get_bus_data(now: Optional[datetime] = None) -> Dict[str, List[int]]:
@@ -366,14 +657,35 @@ def get_bus_data(now: Optional[datetime] = None) -> Dict[str, List[int]]:
         "updated_at": now.isoformat(),
     }
 
-    # 設定されたルートごとにデータ取得
-    for route in config.routes:
-        key = f"{route.stop}_{route.destination}"
-        data[key] = get_next_buses(route.stop, route.destination, now)
+    # 設定された全ルートをまとめて取得
+    all_buses = get_all_next_buses(config.routes, now)
+    for key, buses in all_buses.items():
+        data[key] = [b["minutes"] for b in buses]
 
     return data
 
 
+def _background_load():
+    """起動時の読み込み（失敗しても最初の問い合わせで再試行される）"""
+    try:
+        _load_all_data()
+    except Exception as e:
+        print(f"[GTFS] Background load failed: {e}")
+
+
+def start_background_load():
+    """
+    データの読み込みをバックグラウンドで始める（最初のリクエストを待たせないよう起動時に呼ぶ）
+
+    設定は呼び出し元のスレッドで先に読んでおき、スレッドと呼び出し側で別々に読み込まれないようにする
+    """
+    global _load_thread
+    get_config()
+    if _load_thread is None:
+        _load_thread = threading.Thread(target=_background_load, daemon=True)
+        _load_thread.start()
+
+
 if __name__ == "__main__":
     # テスト
     data = get_bus_data()
@@ -384,5 +696,5 @@ if __name__ == "__main__":
     print()
 
     for route in config.routes:
-        key = f"{route.stop}_{route.destination}"
+        key = route.result_key
         print(f"  {route.display_name}: {data.get(key, [])}")
@@ -4,17 +4,21 @@ GTFSデータ自動更新スクリプト
 毎朝4時に実行して、新しいデータがあればダウンロード
 """
 import os
+import shutil
 import sys
 import urllib.request
 import zipfile
 import json
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 from config import get_config
+from gtfs_parser import CACHE_FILENAME
 
 # 設定
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 VERSION_FILE = os.path.join(DATA_DIR, "version.json")
+CACHE_FILE = os.path.join(DATA_DIR, CACHE_FILENAME)  # gtfs_parser の解析済みキャッシュ
 
 
 def get_current_version():
@@ -35,25 +39,43 @@ def save_version(date_str):
         }, f, indent=2)
 
 
+def _gtfs_date_available(config, date_str):
+    """指定日付のGTFSデータが取得可能かHEADで確認"""
+    url = f"{config.odpt.gtfs_url}?date={date_str}&acl:consumerKey={config.odpt.api_key}"
+    try:
+        req = urllib.request.Request(url, method="HEAD")
+        with urllib.request.urlopen(req, timeout=10) as res:
+            return res.status == 200 or res.status == 302
+    except Exception:
+        return False
+
+
 def get_latest_date(config):
     """ODPTから最新のデータ日付を取得（ヘッダーから推測）"""
-    from datetime import timedelta
     today = datetime.now()
+    date_strs = [
+        (today - timedelta(days=days_ago)).strftime("%Y%m%d")
+        for days_ago in range(0, 30)
+    ]
+
+    # ほとんどの場合は今日の日付で取得できるので、まず1回だけ確認
+    if _gtfs_date_available(config, date_strs[0]):
+        return date_strs[0]
+
+    # 過去の日付はまとめて並列に確認し、取得できた中で最新のものを使う
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        available = executor.map(lambda d: _gtfs_date_available(config, d), date_strs[1:])
+        for date_str, ok in zip(date_strs[1:], available):
+            if ok:
+                return date_str
 
-    for days_ago in range(0, 30):
-        check_date = today - timedelta(days=days_ago)
-        date_str = check_date.strftime("%Y%m%d")
-        url = f"{config.odpt.gtfs_url}?date={date_str}&acl:consumerKey={config.odpt.api_key}"
+    return None
 
-        try:
-            req = urllib.request.Request(url, method="HEAD")
-            with urllib.request.urlopen(req, timeout=10) as res:
-                if res.status == 200 or res.status == 302:
-                    return date_str
-        except:
-            continue
 
-    return None
+def _extract_member(zip_path, name):
+    """ZIP内の1ファイルをDATA_DIRに展開（ZipFileはスレッド間で共有できないので個別に開く）"""
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        zf.extract(name, DATA_DIR)
 
 
 def download_gtfs(config, date_str):
@@ -63,45 +85,34 @@ def download_gtfs(config, date_str):
 
     print(f"Downloading GTFS data (date={date_str})...")
 
-    # ダウンロード（リダイレクトに対応）
+    # ダウンロード（urlopenがリダイレクトを自動で辿る）
+    # 全体をメモリに読み込まず、1MBずつファイルへ書き出す
     req = urllib.request.Request(url)
     with urllib.request.urlopen(req, timeout=60) as res:
-        # リダイレクトの場合
-        if res.status == 302 or "Found" in str(res.read(100)):
-            # curlでリダイレクトをフォロー
-            import subprocess
-            result = subprocess.run(
-                ["curl", "-L", "-s", "-o", zip_path, url],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode != 0:
-                raise Exception(f"Download failed: {result.stderr}")
-        else:
-            # 直接ダウンロード
-            with open(zip_path, "wb") as f:
-                f.write(res.read())
-
-    # ファイルサイズチェック
-    if os.path.getsize(zip_path) < 1000:
-        # 小さすぎる場合はリダイレクトレスポンスの可能性
-        import subprocess
-        result = subprocess.run(
-            ["curl", "-L", "-s", "-o", zip_path, url],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode != 0:
-            raise Exception(f"Download failed: {result.stderr}")
+        content_type = res.headers.get("Content-Type", "")
+        with open(zip_path, "wb") as f:
+            shutil.copyfileobj(res, f, length=1 << 20)
+
+    # ZIP以外（エラーページなど）が返ってきた場合は解凍せずに失敗とする
+    if not zipfile.is_zipfile(zip_path):
+        raise Exception(f"Download failed: not a zip file (Content-Type: {content_type})")
 
     print(f"Downloaded: {os.path.getsize(zip_path)} bytes")
 
     # 解凍
     print("Extracting...")
+    # stop_times.txtの展開中に他のファイルも並行して書き出す（zlibの展開中はGILが解放される）
     with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(DATA_DIR)
+        names = zf.namelist()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda name: _extract_member(zip_path, name), names))
 
     print("Extraction complete")
+
+    # 解析済みキャッシュは古いデータのものなので削除（次回起動時に作り直される）
+    if os.path.exists(CACHE_FILE):
+        os.remove(CACHE_FILE)
+
     return True
 
 